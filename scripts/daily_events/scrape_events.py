@@ -9,19 +9,31 @@ Fuentes: Web abierta via Tavily – busca eventos, restaurantes, cultura y rumba
 import os
 import json
 import time
+import hashlib
+import hmac
+import re
+import sys
 import threading
 import random
 from datetime import datetime, timedelta
+from io import BytesIO
+from urllib.parse import quote
+from zoneinfo import ZoneInfo
 
 import google.generativeai as genai
 from supabase import create_client, Client
-from flask import Flask, jsonify, request
+from PIL import Image
+from flask import Flask, jsonify, request, send_file, abort
 try:
     from flask_cors import CORS
 except ImportError:
     # If not installed yet, just a dummy no-op
     pass
 
+# Permite correr `python scripts/daily_events/scrape_events.py` igual que desde wsgi.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from scripts.scrapers.prefilter import has_event_signal, fill_missing_contacts, normalize_url
+
 # ─── Librerías opcionales (no fallan si no están instaladas) ──────────────────
 try:
     from tavily import TavilyClient
@@ -42,6 +54,23 @@ GEMINI_API_KEY        = os.environ.get("GEMINI_API_KEY")
 SUPABASE_URL          = os.environ.get("SUPABASE_URL")
 SUPABASE_KEY          = os.environ.get("SUPABASE_KEY")          # service_role key
 GOOGLE_PLACES_API_KEY = os.environ.get("GOOGLE_PLACES_API_KEY")
+IMAGE_PROXY_BASE_URL  = os.environ.get("IMAGE_PROXY_BASE_URL")  # ej. https://planmapp-research-agent.onrender.com
+IMAGE_PROXY_SECRET    = os.environ.get("IMAGE_PROXY_SECRET")    # Firma las URLs del proxy (mismo valor en scraper y servidor)
+
+# ─── Proxy de imágenes (caché LRU en disco) ───────────────────────────────────
+IMAGE_CACHE_DIR       = os.environ.get("IMAGE_CACHE_DIR", "/tmp/planmapp_image_cache")
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get("IMAGE_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+IMAGE_CACHE_MAX_AGE   = 60 * 60 * 24 * 365  # Las variantes son inmutables por clave
+IMAGE_VARIANTS        = {"thumb": 200, "card": 480, "full": 1080}
+IMAGE_SOURCES         = {
+    # La API key de Google solo vive en el servidor, nunca en la URL guardada en BD
+    "places":   lambda ref: (
+        f"https://maps.googleapis.com/maps/api/place/photo"
+        f"?maxwidth=1600&photo_reference={quote(ref, safe='')}&key={GOOGLE_PLACES_API_KEY}"
+    ),
+    "unsplash": lambda ref: f"https://images.unsplash.com/{ref}?fm=jpg&fit=max&w=1600&q=85",
+}
+UNSPLASH_REF_RE       = re.compile(r"^photo-[\w-]+$")
 
 # ─── Ciudades y categorías objetivo ────────────────────────────────────────────
 CITIES = ["Bogotá", "Medellín", "Cali", "Barranquilla", "Cartagena", "Santa Marta", "Bucaramanga", "Pereira", "Manizales", "Armenia", "Villavicencio", "Cúcuta"]
@@ -93,6 +122,29 @@ FALLBACK_IMAGES = {
     ]
 }
 
+def _sign_image_ref(source: str, ref: str) -> str:
+    """HMAC de source:ref. Solo el scraper (que conoce el secreto) puede emitir URLs válidas."""
+    return hmac.new(IMAGE_PROXY_SECRET.encode("utf-8"), f"{source}:{ref}".encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+
+
+def proxy_image_url(source: str, ref: str) -> str | None:
+    """URL estable y firmada del proxy /image para guardar en BD (sin API keys ni tamaños fijos)."""
+    if not IMAGE_PROXY_BASE_URL or not IMAGE_PROXY_SECRET or not ref:
+        return None
+    if source == "unsplash" and not UNSPLASH_REF_RE.match(ref):
+        return None
+    return f"{IMAGE_PROXY_BASE_URL.rstrip('/')}/image/{source}/{quote(ref, safe='')}?sig={_sign_image_ref(source, ref)}"
+
+
+def proxy_unsplash_url(url: str) -> str:
+    """Convierte una URL absoluta de Unsplash en su URL de proxy (o la deja igual si no hay proxy)."""
+    prefix = "https://images.unsplash.com/"
+    if not url.startswith(prefix):
+        return url
+    ref = url[len(prefix):].split("?", 1)[0]
+    return proxy_image_url("unsplash", ref) or url
+
+
 # ─── Paso 1: Búsqueda con Tavily ───────────────────────────────────────────────
 def search_with_tavily(city: str, category: dict) -> list[dict]:
     """Usa Tavily para buscar eventos/lugares reales en la web."""
@@ -126,6 +178,19 @@ def extract_events_with_gemini(results: list[dict], city: str, category: dict) -
     if not GEMINI_API_KEY or not results:
         return []
 
+    # Pre-filtro local: descartamos snippets sin fechas, precios ni promos antes de pagar por Gemini
+    results_by_url = {}
+    relevant = []
+    for r in results:
+        text = f"{r.get('title', '')} {r.get('content', '')}"
+        if has_event_signal(text):
+            relevant.append(r)
+            results_by_url[normalize_url(r.get("url", ""))] = (r.get("url"), text)
+    print(f"  [FILTRO] {len(relevant)}/{len(results)} resultados con señales de evento")
+    if not relevant:
+        return []
+    results = relevant
+
     genai.configure(api_key=GEMINI_API_KEY)
     model = genai.GenerativeModel("gemini-2.5-flash")
 
@@ -185,7 +250,16 @@ Resultados a analizar:
         events = json.loads(raw.strip())
         if not isinstance(events, list):
             return []
-        return events
+        # Teléfono y link extraídos localmente del snippet original si Gemini los dejó vacíos.
+        # Se busca por URL normalizada porque Gemini puede reescribirla (slash final, www...).
+        for e in events:
+            if not isinstance(e, dict):
+                continue
+            source_url, text = results_by_url.get(normalize_url(e.get("source_url") or ""), (None, ""))
+            fill_missing_contacts(e, text, phone_key="contact_info", link_key="reservation_link")
+            if not e.get("reservation_link") and source_url:
+                e["reservation_link"] = source_url
+        return [e for e in events if isinstance(e, dict)]
     except Exception as e:
         print(f"  [GEMINI] Error al extraer: {e}")
         return []
@@ -219,7 +293,8 @@ def geocode_with_google_places(supabase: Client, location_name: str, address: st
                 "longitude": p.get("longitude"),
                 "rating_google": p.get("rating"),
                 "price_level": p.get("price_level"),
-                "google_image_url": None, # No replicamos la URL firmada para evitar expiración
+                # La URL del proxy es estable, así que sí podemos reutilizar la foto cacheada
+                "google_image_url": proxy_image_url("places", p.get("photo_reference")),
                 "already_in_cache": True
             }
     except Exception as e:
@@ -250,8 +325,8 @@ def geocode_with_google_places(supabase: Client, location_name: str, address: st
         if place.get("photos"):
             photo_ref = place["photos"][0].get("photo_reference")
 
-        image_url = None
-        if photo_ref:
+        image_url = proxy_image_url("places", photo_ref)
+        if photo_ref and not image_url:
             image_url = (
                 f"https://maps.googleapis.com/maps/api/place/photo"
                 f"?maxwidth=800&photo_reference={photo_ref}&key={GOOGLE_PLACES_API_KEY}"
@@ -288,7 +363,7 @@ def upsert_event(supabase: Client, event: dict, city: str, category: dict, geo:
     if not image_url or len(str(image_url).strip()) < 5:
         cat_key = category["key"]
         if cat_key in FALLBACK_IMAGES:
-            image_url = random.choice(FALLBACK_IMAGES[cat_key])
+            image_url = proxy_unsplash_url(random.choice(FALLBACK_IMAGES[cat_key]))
 
     record = {
         "event_name":       event["title"],
@@ -302,6 +377,7 @@ def upsert_event(supabase: Client, event: dict, city: str, category: dict, geo:
         "primary_source":   event["source_url"],
         "city":             city,
         "contact_phone":    geo.get("contact_info") if geo and geo.get("contact_info") else event.get("contact_info"),
+        "reservation_link": event.get("reservation_link"),
         "google_place_id":  geo.get("google_place_id") if geo else None,
         "latitude":         geo.get("latitude") if geo else None,
         "longitude":        geo.get("longitude") if geo else None,
@@ -320,6 +396,43 @@ def upsert_event(supabase: Client, event: dict, city: str, category: dict, geo:
         print(f"  ❌ Error Supabase (local_events): {e}")
 
 
+# ─── Paso 5: Compactación (archivo de eventos vencidos) ────────────────────────
+COMPACT_BATCH_SIZE = 500
+# "Hoy" es el día en Colombia (igual que la app); en UTC los eventos de esta noche ya saldrían vencidos
+APP_TIMEZONE = ZoneInfo("America/Bogota")
+
+def compact_local_events(supabase: Client, batch_size: int = COMPACT_BATCH_SIZE) -> int:
+    """
+    Mueve por lotes los eventos vencidos (end_date/date < hoy) a local_events_archive
+    y marca como 'expired' los status obsoletos. Mantiene local_events proporcional
+    a los eventos vivos para que las lecturas por ciudad+fecha sigan siendo baratas.
+    Si el RPC falla (ej. migración sin aplicar) relanza la excepción para que el job falle.
+    """
+    today = datetime.now(APP_TIMEZONE).strftime("%Y-%m-%d")
+    total_archived = 0
+    total_marked = 0
+    while True:
+        try:
+            res = supabase.rpc(
+                "compact_local_events",
+                {"p_today": today, "p_batch_size": batch_size},
+            ).execute()
+        except Exception as e:
+            print(f"  ❌ Error compactando local_events: {e}")
+            raise
+
+        result = res.data if isinstance(res.data, dict) else {}
+        archived = result.get("archived") or 0
+        marked = result.get("marked") or 0
+        total_archived += archived
+        total_marked += marked
+        if archived < batch_size and marked < batch_size:
+            break
+
+    print(f"🗄️  Compactación: {total_archived} eventos archivados, {total_marked} marcados como expirados")
+    return total_archived
+
+
 # ─── Proceso principal ────────────────────────────────────────────────────────
 def run_research_agent():
     """Itera ciudades × categorías, busca, extrae, geocodifica y guarda."""
@@ -372,6 +485,9 @@ def run_research_agent():
         print("  ⏳ [Throttling] Pausa de 10 segundos entre ciudades...")
         time.sleep(10)  
 
+    # 4. Mantenimiento: sacar de la tabla caliente lo que ya venció
+    compact_local_events(supabase)
+
     print(f"\n✅ Proceso completado. Total eventos procesados: {total_saved}")
     print(f"{'='*60}\n")
 
@@ -413,6 +529,121 @@ def status():
     return jsonify({"running": is_running}), 200
 
 
+# ─── Proxy de imágenes ────────────────────────────────────────────────────────
+image_cache_lock = threading.Lock()
+image_fetch_locks: dict[str, threading.Lock] = {}
+
+
+def _image_cache_path(key: str, variant: str) -> str:
+    return os.path.join(IMAGE_CACHE_DIR, f"{key}_{variant}.jpg")
+
+
+def _render_variants(raw: bytes) -> dict[str, bytes]:
+    """Genera thumb/card/full como JPEG (el formato original se normaliza siempre)."""
+    source = Image.open(BytesIO(raw)).convert("RGB")
+    rendered = {}
+    for variant, width in IMAGE_VARIANTS.items():
+        img = source.copy()
+        img.thumbnail((width, width * 4))  # Solo limita el ancho, nunca amplía
+        buf = BytesIO()
+        img.save(buf, format="JPEG", quality=82, optimize=True, progressive=True)
+        rendered[variant] = buf.getvalue()
+    return rendered
+
+
+def _evict_image_cache():
+    """Borra las variantes menos usadas (mtime más antiguo) hasta volver al límite de bytes."""
+    with image_cache_lock:
+        entries = []
+        for name in os.listdir(IMAGE_CACHE_DIR):
+            path = os.path.join(IMAGE_CACHE_DIR, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= IMAGE_CACHE_MAX_BYTES:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+
+
+def _fill_image_cache(source: str, ref: str, key: str) -> bool:
+    """Descarga la imagen original UNA sola vez y guarda todas sus variantes en disco."""
+    with image_cache_lock:
+        fetch_lock = image_fetch_locks.setdefault(key, threading.Lock())
+
+    with fetch_lock:
+        # Otro worker pudo haberla llenado mientras esperábamos
+        if all(os.path.exists(_image_cache_path(key, v)) for v in IMAGE_VARIANTS):
+            return True
+        try:
+            resp = _requests.get(IMAGE_SOURCES[source](ref), timeout=15)
+            resp.raise_for_status()
+            variants = _render_variants(resp.content)
+
+            os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+            for variant, data in variants.items():
+                # Escritura atómica para no servir archivos a medio escribir
+                path = _image_cache_path(key, variant)
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"  [IMAGE] Error obteniendo {source}/{ref[:40]}: {e}")
+            return False
+        finally:
+            with image_cache_lock:
+                image_fetch_locks.pop(key, None)
+
+    _evict_image_cache()
+    return True
+
+
+@app.route("/image/<source>/<ref>", methods=["GET"])
+def image_proxy(source: str, ref: str):
+    """
+    Sirve fotos de eventos redimensionadas (?size=thumb|card|full) desde la caché en disco.
+    Solo acepta URLs firmadas por proxy_image_url (?sig=...).
+    Cada original se descarga una vez, ahorrando llamadas facturables a Places Photo.
+    """
+    variant = request.args.get("size", "card")
+    if source not in IMAGE_SOURCES or variant not in IMAGE_VARIANTS or not HAS_REQUESTS:
+        abort(404)
+    if source == "places" and not GOOGLE_PLACES_API_KEY:
+        abort(404)
+    if source == "unsplash" and not UNSPLASH_REF_RE.match(ref):
+        abort(404)
+    # Sin firma válida no hay fetch: evita que un cliente use nuestra API key con refs arbitrarios
+    sig = request.args.get("sig", "")
+    if not IMAGE_PROXY_SECRET or not hmac.compare_digest(sig, _sign_image_ref(source, ref)):
+        abort(404)
+
+    key = hashlib.sha256(f"{source}:{ref}".encode("utf-8")).hexdigest()[:32]
+    path = _image_cache_path(key, variant)
+    if not os.path.exists(path) and not _fill_image_cache(source, ref, key):
+        return jsonify({"error": "No se pudo obtener la imagen"}), 502
+
+    try:
+        os.utime(path)  # Marca de uso reciente para el LRU (por eso el ETag no depende del mtime)
+        response = send_file(
+            path, mimetype="image/jpeg", conditional=True,
+            etag=f"{key}-{variant}", max_age=IMAGE_CACHE_MAX_AGE,
+        )
+    except FileNotFoundError:
+        # Desalojada entre la verificación y el envío
+        abort(404)
+    response.headers["Cache-Control"] = f"public, max-age={IMAGE_CACHE_MAX_AGE}, immutable"
+    return response
+
+
 @app.route("/chat_agent", methods=["POST"])
 def chat_agent():
     """
@@ -516,9 +747,17 @@ RESPONDE SOLAMENTE UN JSON VÁLIDO SIN MARKDOWN:
 # ─── Entry point ──────────────────────────────────────────────────────────────
 if __name__ == "__main__":
     # Si se llama directamente (GitHub Actions cron), corre el agente y sale
-    import sys
     if len(sys.argv) > 1 and sys.argv[1] == "--once":
         run_research_agent()
+    elif len(sys.argv) > 1 and sys.argv[1] == "--compact":
+        # Solo mantenimiento, sin scrapear
+        if not SUPABASE_URL or not SUPABASE_KEY:
+            print("❌ SUPABASE_URL o SUPABASE_KEY no configuradas. Abortando.")
+            sys.exit(1)
+        try:
+            compact_local_events(create_client(SUPABASE_URL, SUPABASE_KEY))
+        except Exception:
+            sys.exit(1)
     else:
         # Modo servidor Render
         port = int(os.environ.get("PORT", 10000))
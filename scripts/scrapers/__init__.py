@@ -0,0 +1 @@
+# Init para que Python trate scripts/scrapers/ como paquete
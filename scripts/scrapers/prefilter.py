@@ -0,0 +1,158 @@
+"""
+Pre-filtro local (sin costo) que corre ANTES de cualquier llamada a Gemini.
+
+Usa palabras clave, regex y heurísticas de fecha para decidir si un texto crudo
+tiene señales de evento/promoción, y extrae localmente teléfonos colombianos y
+links de reserva para no depender del LLM en esos campos.
+"""
+import re
+
+# ─── Señales ──────────────────────────────────────────────────────────────────
+PROMO_RE = re.compile(
+    r"(?<!\w)(?:"
+    r"\d\s?x\s?\d"                                        # 2x1, 3 x 2
+    r"|happy\s?hour|ladies\s?night|after\s?office"
+    r"|descuento|promo(?:ción|cion)?s?\b|oferta|gratis|cortes[ií]a"
+    r"|\d{1,2}\s?%\s?(?:off|dto|de descuento)?"
+    r"|entrada\s(?:libre|gratuita)|sin\scover|cover\s(?:de\s)?\$?\s?\d[\d.,]*"
+    r"|preventa|boleter[ií]a|boletas|tickets?"
+    r"|en\svivo|concierto|festival|fiesta|stand\s?up|tributo|karaoke"
+    r"|shows?\s(?:en\svivo|de\s(?:comedia|humor|magia|drag|talentos))"
+    r"|men[uú]\sdel\sd[ií]a|brunch|degustaci[oó]n|cata\sde"
+    r")(?!\w)",
+    re.IGNORECASE,
+)
+
+_WEEKDAYS = r"lunes|martes|mi[eé]rcoles|jueves|viernes|s[aá]bados?|domingos?"
+_MONTHS = (
+    r"enero|febrero|marzo|abril|mayo|junio|julio|agosto"
+    r"|septiembre|setiembre|octubre|noviembre|diciembre"
+)
+DATE_RE = re.compile(
+    rf"\b(?:{_WEEKDAYS})\b"
+    rf"|\b\d{{1,2}}\s(?:de\s)?(?:{_MONTHS})\b"
+    r"|\b\d{4}-\d{2}-\d{2}\b|\b\d{1,2}/\d{1,2}/\d{4}\b"
+    r"|\bhoy\b|esta\snoche|fin\sde\ssemana|puente\sfestivo",
+    re.IGNORECASE,
+)
+
+# Rangos de horario ("de lunes a sábado", "lunes - viernes") describen el local, no un evento
+WEEKDAY_RANGE_RE = re.compile(
+    rf"(?:\bde\s)?\b(?:{_WEEKDAYS})\s?(?:a|al|-|–)\s?(?:{_WEEKDAYS})\b",
+    re.IGNORECASE,
+)
+
+# DD/MM sin año es ambiguo ("24/7", "1/4 de libra", "Calificación 4/5"): solo cuenta con
+# contexto de fecha, es decir un día de la semana o "el"/"del"/"hasta"... antes, o una hora después.
+SHORT_DATE_RE = re.compile(r"(?<![\d.,/])(\d{1,2})/(\d{1,2})(?![\d/])")
+SHORT_DATE_BEFORE_RE = re.compile(
+    rf"\b(?:{_WEEKDAYS}|el|del|hasta|desde|este|pr[oó]ximo)\s?,?\s?$",
+    re.IGNORECASE,
+)
+SHORT_DATE_AFTER_RE = re.compile(
+    r"^\s?,?\s?(?:(?:a|desde)\slas\s\d|\d{1,2}(?::\d{2})?\s?(?:a\.?\s?m\.?|p\.?\s?m\.?|hrs?\b))",
+    re.IGNORECASE,
+)
+
+PRICE_RE = re.compile(
+    r"\$\s?\d{1,3}(?:[.,]\d{3})+|\$\s?\d+\s?(?:mil|k)\b|\b\d+\s?mil\s?pesos\b|\bCOP\b",
+    re.IGNORECASE,
+)
+
+# Celulares (3XX XXX XXXX) y fijos con indicativo 60X ("601 234 5678", "(605) 3581234"), con o sin +57 / 57
+PHONE_RE = re.compile(r"(?<!\d)(?:\+?57[\s.-]?)?\(?(3\d{2}|60\d)\)?[\s.-]?(\d{3})[\s.-]?(\d{4})(?!\d)")
+WHATSAPP_RE = re.compile(r"wa\.me/(?:\+?57)?(3\d{9})", re.IGNORECASE)
+
+# El esquema es opcional: en los snippets suele aparecer "wa.me/57300..." o "instagram.com/bar" a secas
+BOOKING_LINK_RE = re.compile(
+    r"(?<![\w.@/])(?:https?://)?(?:www\.)?"
+    r"(?:wa\.me|api\.whatsapp\.com|linktr\.ee|tuboleta\.com|eticket\.co|taquillalive\.com"
+    r"|primerafila\.com\.co|ticketshop\.com\.co|passline\.com|opentable\.com|resy\.com"
+    r"|instagram\.com|facebook\.com)"
+    r"[^\s\"'<>)\]]*",
+    re.IGNORECASE,
+)
+
+NO_PUBLICADO = "No publicado"
+
+
+def _has_date(text: str) -> bool:
+    """Fechas explícitas o días puntuales; ignora rangos de horario, 24/7, fracciones y calificaciones."""
+    if DATE_RE.search(WEEKDAY_RANGE_RE.sub(" ", text)):
+        return True
+    for m in SHORT_DATE_RE.finditer(text):
+        day, month = int(m.group(1)), int(m.group(2))
+        if not (1 <= day <= 31 and 1 <= month <= 12):
+            continue
+        if SHORT_DATE_BEFORE_RE.search(text[max(0, m.start() - 20):m.start()]) or SHORT_DATE_AFTER_RE.match(text[m.end():]):
+            return True
+    return False
+
+
+def normalize_url(url: str) -> str:
+    """Clave de comparación para URLs: sin esquema, www, fragmento ni slash final, en minúsculas."""
+    if not url:
+        return ""
+    url = re.sub(r"^https?://(?:www\.)?", "", url.strip(), flags=re.IGNORECASE)
+    return url.split("#", 1)[0].rstrip("/").lower()
+
+
+def detect_signals(text: str) -> set:
+    """Returns which cheap signals ('promo', 'date', 'price', 'contact') appear in the text."""
+    if not text:
+        return set()
+    signals = set()
+    if PROMO_RE.search(text):
+        signals.add("promo")
+    if _has_date(text):
+        signals.add("date")
+    if PRICE_RE.search(text):
+        signals.add("price")
+    if PHONE_RE.search(text) or BOOKING_LINK_RE.search(text):
+        signals.add("contact")
+    return signals
+
+
+def has_event_signal(text: str) -> bool:
+    """
+    True si vale la pena mandar el texto a Gemini.
+    Solo contacto no basta: esos campos se extraen localmente con extract_contacts().
+    """
+    return bool(detect_signals(text) & {"promo", "date", "price"})
+
+
+def extract_contacts(text: str) -> dict:
+    """Extracts the first Colombian phone (as +57XXXXXXXXXX) and booking link (with https://) found in the text."""
+    contacts = {"contact_phone": None, "reservation_link": None}
+    if not text:
+        return contacts
+
+    wa = WHATSAPP_RE.search(text)
+    if wa:
+        contacts["contact_phone"] = f"+57{wa.group(1)}"
+    else:
+        phone = PHONE_RE.search(text)
+        if phone:
+            contacts["contact_phone"] = "+57" + "".join(phone.groups())
+
+    link = BOOKING_LINK_RE.search(text)
+    if link:
+        url = link.group(0).rstrip(".,;:")
+        contacts["reservation_link"] = url if re.match(r"https?://", url, re.IGNORECASE) else f"https://{url}"
+    return contacts
+
+
+def fill_missing_contacts(event: dict, text: str, phone_key: str = "contact_phone", link_key: str = "reservation_link") -> dict:
+    """Completes phone/link fields the LLM left empty (or 'No publicado') using local extraction."""
+    local = None
+    for key, local_key in ((phone_key, "contact_phone"), (link_key, "reservation_link")):
+        if not key:
+            continue
+        value = event.get(key)
+        if value and str(value).strip() and str(value).strip() != NO_PUBLICADO:
+            continue
+        if local is None:
+            local = extract_contacts(text)
+        if local[local_key]:
+            event[key] = local[local_key]
+    return event
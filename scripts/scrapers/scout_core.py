@@ -1,5 +1,6 @@
 import os
 import json
+import time
 import logging
 import requests
 from bs4 import BeautifulSoup
@@ -7,6 +8,7 @@ import google.generativeai as genai
 from supabase import create_client, Client
 from datetime import datetime
 from urllib.parse import quote_plus
+from prefilter import has_event_signal, fill_missing_contacts
 
 # Setup Logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -27,26 +29,61 @@ try:
 except Exception as e:
     logging.error(f"Error al inicializar clientes: {e}")
 
-def get_top_places(city: str) -> list:
-    """Fetch 4.0+ star places for a given city from cached_places."""
+# PostgREST corta silenciosamente en ~1000 filas, asi que paginamos por debajo de ese tope.
+PAGE_SIZE = 500
+
+# Reintentos por pagina antes de abortar la lectura (una pagina perdida = ciudad truncada).
+PAGE_RETRIES = 3
+
+# Solo las columnas que consumen process_with_gemini y safe_insert_event.
+TOP_PLACE_COLUMNS = 'place_id, name, address, city, photo_reference, latitude, longitude'
+
+def _iter_keyset(table: str, columns: str, key: str, apply_filters, page_size: int = PAGE_SIZE):
+    """
+    Recorre una tabla por keyset pagination (ORDER BY key, key > ultimo visto).
+    A diferencia de OFFSET, cada pagina cuesta lo mismo sin importar el tamaño de la ciudad.
+    Una pagina fallida se reintenta; si sigue fallando se relanza la excepcion en vez de
+    terminar en silencio con la ciudad a medias.
+    """
+    last_key = None
+    while True:
+        for attempt in range(1, PAGE_RETRIES + 1):
+            query = apply_filters(supabase.table(table).select(columns))
+            if last_key is not None:
+                query = query.gt(key, last_key)
+            try:
+                rows = query.order(key).limit(page_size).execute().data or []
+                break
+            except Exception as e:
+                if attempt == PAGE_RETRIES:
+                    raise
+                logging.warning(f"⚠️ Pagina de {table} fallo (intento {attempt}/{PAGE_RETRIES}): {e}")
+                time.sleep(2 ** attempt)
+        yield from rows
+        if len(rows) < page_size:
+            return
+        last_key = rows[-1][key]
+
+def iter_top_places(city: str):
+    """Yield 4.0+ star places for a given city from cached_places, page by page."""
     logging.info(f"🔍 Buscando comercios TOP en {city}...")
-    try:
-        response = supabase.table('cached_places').select('*').eq('city', city).gte('rating', 4.0).execute()
-        return response.data
-    except Exception as e:
-        logging.error(f"Error fetching top places: {e}")
-        return []
+    yield from _iter_keyset(
+        'cached_places', TOP_PLACE_COLUMNS, 'place_id',
+        lambda q: q.eq('city', city).gte('rating', 4.0),
+    )
 
-def get_known_events(city: str) -> list:
-    """Fetch future events for a city to instruct the AI to ignore them."""
+def iter_known_events(city: str):
+    """Yield future events for a city (only id and event_name), page by page."""
     today = datetime.now().strftime("%Y-%m-%d")
     logging.info(f"🔍 Descargando memoria de eventos futuros desde {today}...")
-    try:
-        response = supabase.table('local_events').select('event_name, date').eq('city', city).gte('date', today).execute()
-        return response.data
-    except Exception as e:
-        logging.error(f"Error fetching known events: {e}")
-        return []
+    yield from _iter_keyset(
+        'local_events', 'id, event_name', 'id',
+        lambda q: q.eq('city', city).gte('date', today),
+    )
+
+def get_known_events(city: str) -> list:
+    """Fetch future events for a city to instruct the AI to ignore them."""
+    return list(iter_known_events(city))
 
 def fetch_raw_text_about_place(place_name: str, city: str) -> str:
     """
@@ -74,6 +111,10 @@ def fetch_raw_text_about_place(place_name: str, city: str) -> str:
 def process_with_gemini(raw_text: str, place: dict, known_events: list) -> list:
     """Send text to Gemini 2.5 Flash to extract JSON events."""
     if not raw_text or len(raw_text) < 20: return []
+    # Pre-filtro local: sin fechas, precios ni palabras de promo no gastamos una llamada a Gemini
+    if not has_event_signal(raw_text):
+        logging.info(f"🚫 Sin señales de evento/promo para {place['name']}. Omitiendo Gemini.")
+        return []
     
     known_events_str = ", ".join([e.get('event_name', '') for e in known_events])
     
@@ -122,7 +163,10 @@ def process_with_gemini(raw_text: str, place: dict, known_events: list) -> list:
         response = model.generate_content(prompt)
         text_resp = response.text.replace("```json", "").replace("```", "").strip()
         data = json.loads(text_resp)
-        return data if isinstance(data, list) else []
+        if not isinstance(data, list):
+            return []
+        # El teléfono y el link se completan localmente si Gemini no los encontró
+        return [fill_missing_contacts(e, raw_text) for e in data if isinstance(e, dict)]
     except Exception as e:
         logging.error(f"Gemini API Error para {place['name']}: {e}")
         return []
@@ -0,0 +1,87 @@
+"""
+Casos reales (positivos y negativos) del pre-filtro local.
+Correr con: python -m unittest discover -s scripts/scrapers
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from prefilter import detect_signals, extract_contacts, has_event_signal, normalize_url  # noqa: E402
+
+# (texto, señales esperadas)
+SIGNAL_CASES = [
+    ("2x1 en cócteles todos los jueves", {"promo", "date"}),
+    ("Happy Hour de 5 a 7 pm en la terraza", {"promo"}),
+    ("Gran concierto de salsa el 15 de noviembre", {"promo", "date"}),
+    ("Este viernes noche de karaoke", {"promo", "date"}),
+    ("Preventa boletas 20/12/2026 en TuBoleta", {"promo", "date"}),
+    ("Fiesta de lanzamiento el 14/11, cupos limitados", {"promo", "date"}),
+    ("Sábado 14/11 rumba crossover", {"date"}),
+    ("Noche salsera 21/11 a las 9 pm", {"date"}),
+    ("Entradas desde $45.000", {"price"}),
+    ("Cover de $20.000 con consumible", {"promo", "price"}),
+    ("Jueves y viernes 20% de descuento", {"promo", "date"}),
+    ("Show en vivo hoy", {"promo", "date"}),
+    ("Reservas al +57 300 123 4567", {"contact"}),
+    # Negativos: texto descriptivo sin temporalidad ni oferta
+    ("Restaurante familiar con ambiente agradable", set()),
+    ("Calificación 4/5 en Google", set()),
+    ("4/5 estrellas según los usuarios", set()),
+    ("Abierto de lunes a sábado", set()),
+    ("Atención lunes - viernes", set()),
+    ("Desayunos en la mañana", set()),
+    ("Abrimos a las 12:00", set()),
+    ("Discover our showroom, the best restaurant in town", set()),
+    ("Cover photo of the restaurant", set()),
+    ("Watch the show online", set()),
+    ("Abierto 24/7 con domicilios", set()),
+    ("Hamburguesa 1/4 de libra", set()),
+]
+
+# (texto, teléfono esperado, link esperado)
+CONTACT_CASES = [
+    ("Escríbenos al +57 300 123 4567 o https://linktr.ee/bar.", "+573001234567", "https://linktr.ee/bar"),
+    ("WhatsApp 310-555-1234", "+573105551234", None),
+    ("Reservas: wa.me/573001234567", "+573001234567", "https://wa.me/573001234567"),
+    ("Síguenos en instagram.com/bar_x", None, "https://instagram.com/bar_x"),
+    ("Fijo Bogotá 601 234 5678", "+576012345678", None),
+    ("Tel: (605) 3581234", "+576053581234", None),
+    ("PBX (+57) 604 444 1234 · www.tuboleta.com/evento/123", "+576044441234", "https://www.tuboleta.com/evento/123"),
+    ("Escríbenos a reservas@instagram.com", None, None),
+    ("Sin datos de contacto", None, None),
+    ("NIT 900123456-7", None, None),
+]
+
+
+class DetectSignalsTest(unittest.TestCase):
+    def test_cases(self):
+        for text, expected in SIGNAL_CASES:
+            with self.subTest(text=text):
+                self.assertEqual(detect_signals(text), expected)
+
+    def test_contact_only_is_not_worth_llm(self):
+        self.assertFalse(has_event_signal("Reservas al +57 300 123 4567"))
+        self.assertTrue(has_event_signal("2x1 en cócteles todos los jueves"))
+
+
+class ExtractContactsTest(unittest.TestCase):
+    def test_cases(self):
+        for text, phone, link in CONTACT_CASES:
+            with self.subTest(text=text):
+                contacts = extract_contacts(text)
+                self.assertEqual(contacts["contact_phone"], phone)
+                self.assertEqual(contacts["reservation_link"], link)
+
+
+class NormalizeUrlTest(unittest.TestCase):
+    def test_equivalent_urls(self):
+        self.assertEqual(
+            normalize_url("https://www.Example.com/eventos/"),
+            normalize_url("http://example.com/eventos#top"),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+-- Migration: Expiry compaction for local_events
+-- Created at: 2026-05-01
+-- Objective: Keep local_events proportional to LIVE events. Expired rows are moved in batches
+-- to local_events_archive by the research agent after each scrape (scrape_events.py --compact).
+--
+-- This becomes the ONLY expiry path for local_events:
+--   * cleanup_expired_events (20260428) is unscheduled: expires_at / 'rejected' rows are now
+--     archived here, with the same plans.image_url check before deleting their storage file.
+--   * cleanup_old_local_events (2026043001) now archives instead of hard-deleting, so the
+--     existing daily_maintenance_job keeps working as a backstop if the scraper stops running.
+-- Archiving keeps the row (plans only reference events by copied image_url, never by FK),
+-- so moving a referenced row out of the hot table is safe.
+
+-- 1. Composite index for the hot read path (city = X AND date >= today).
+-- It also serves city-only filters, so the single-column city index is redundant.
+CREATE INDEX IF NOT EXISTS idx_local_events_city_date ON public.local_events(city, date);
+DROP INDEX IF EXISTS public.idx_local_events_city;
+
+-- 2. Archive table (explicit columns: the move below names every column, never relies on order)
+CREATE TABLE IF NOT EXISTS public.local_events_archive (
+    id UUID PRIMARY KEY,
+    event_name TEXT NOT NULL,
+    description TEXT,
+    date DATE NOT NULL,
+    end_date DATE,
+    venue_name TEXT,
+    address TEXT,
+    reservation_link TEXT,
+    contact_phone TEXT,
+    price_range TEXT,
+    primary_source TEXT,
+    image_url TEXT,
+    city TEXT NOT NULL,
+    vibe_tag TEXT,
+    latitude DOUBLE PRECISION,
+    longitude DOUBLE PRECISION,
+    created_at TIMESTAMPTZ,
+    promo_highlights TEXT,
+    visual_keyword TEXT,
+    status TEXT,
+    price_level TEXT,
+    place_id TEXT,
+    expires_at TIMESTAMPTZ,
+    archived_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_local_events_archive_city_date ON public.local_events_archive(city, date);
+
+-- Only the service role (scraper) touches the archive
+ALTER TABLE public.local_events_archive ENABLE ROW LEVEL SECURITY;
+
+-- 3. Batch compaction: moves one batch of stale events to the archive.
+-- Stale = past COALESCE(end_date, date), past expires_at, or rejected by moderation.
+-- "Today" is the Colombian date (the app filters date >= today on the device). CURRENT_DATE is
+-- UTC, which at 19:00-24:00 in Colombia would already archive tonight's events.
+-- The caller loops until archived < p_batch_size, so each transaction stays short.
+CREATE OR REPLACE FUNCTION public.compact_local_events(
+  p_today DATE DEFAULT (NOW() AT TIME ZONE 'America/Bogota')::DATE,
+  p_batch_size INT DEFAULT 500
+)
+RETURNS JSONB AS $$
+DECLARE
+  v_ids UUID[];
+  v_marked INT := 0;
+BEGIN
+  SELECT array_agg(id) INTO v_ids FROM (
+    SELECT id FROM public.local_events
+    WHERE COALESCE(end_date, date) < p_today
+       OR expires_at < NOW()
+       OR status = 'rejected'
+    ORDER BY date
+    LIMIT p_batch_size
+    FOR UPDATE SKIP LOCKED
+  ) stale;
+
+  IF v_ids IS NULL THEN
+    RETURN jsonb_build_object('marked', 0, 'archived', 0);
+  END IF;
+
+  -- 'active' / 'pending' rows that ran out are stale: archive them as 'expired'
+  UPDATE public.local_events SET status = 'expired'
+  WHERE id = ANY(v_ids) AND (status IS NULL OR status IN ('active', 'pending'));
+  GET DIAGNOSTICS v_marked = ROW_COUNT;
+
+  WITH moved AS (
+    DELETE FROM public.local_events WHERE id = ANY(v_ids)
+    RETURNING id, event_name, description, date, end_date, venue_name, address,
+              reservation_link, contact_phone, price_range, primary_source, image_url,
+              city, vibe_tag, latitude, longitude, created_at, promo_highlights,
+              visual_keyword, status, price_level, place_id, expires_at
+  )
+  INSERT INTO public.local_events_archive (
+    id, event_name, description, date, end_date, venue_name, address,
+    reservation_link, contact_phone, price_range, primary_source, image_url,
+    city, vibe_tag, latitude, longitude, created_at, promo_highlights,
+    visual_keyword, status, price_level, place_id, expires_at
+  )
+  SELECT id, event_name, description, date, end_date, venue_name, address,
+         reservation_link, contact_phone, price_range, primary_source, image_url,
+         city, vibe_tag, latitude, longitude, created_at, promo_highlights,
+         visual_keyword, status, price_level, place_id, expires_at
+  FROM moved
+  ON CONFLICT (id) DO NOTHING;
+
+  -- Same rule as the old cleanup_expired_events: the uploaded image is kept while a plan still uses it
+  DELETE FROM storage.objects o
+  USING public.local_events_archive a
+  WHERE a.id = ANY(v_ids)
+    AND a.image_url LIKE '%/event_images/%'
+    AND o.bucket_id = 'event_images'
+    AND o.name = substring(a.image_url from 'event_images/(.*)$')
+    AND NOT EXISTS (SELECT 1 FROM public.plans p WHERE p.image_url = a.image_url);
+
+  RETURN jsonb_build_object('marked', v_marked, 'archived', array_length(v_ids, 1));
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+REVOKE EXECUTE ON FUNCTION public.compact_local_events(DATE, INT) FROM PUBLIC, anon, authenticated;
+
+-- 4. One expiry path: the daily maintenance job archives instead of hard-deleting
+CREATE OR REPLACE FUNCTION public.cleanup_old_local_events()
+RETURNS void AS $$
+DECLARE
+  v_result JSONB;
+BEGIN
+  LOOP
+    v_result := public.compact_local_events((NOW() AT TIME ZONE 'America/Bogota')::DATE, 500);
+    EXIT WHEN (v_result->>'archived')::INT < 500;
+  END LOOP;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Runs as definer (touches storage.objects): only pg_cron / service role may call it, never /rpc with the anon key
+REVOKE EXECUTE ON FUNCTION public.cleanup_old_local_events() FROM PUBLIC, anon, authenticated;
+-- run_daily_maintenance (2026043001) is also SECURITY DEFINER and now reaches the compaction
+REVOKE EXECUTE ON FUNCTION public.run_daily_maintenance() FROM PUBLIC, anon, authenticated;
+
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_cron') THEN
+    BEGIN
+      PERFORM cron.unschedule('cleanup_expired_events_job');
+    EXCEPTION WHEN OTHERS THEN
+      -- Ignore (job was never scheduled)
+    END;
+  END IF;
+END $$;